@@ -0,0 +1,73 @@
+import os
+import time
+import sqlite3
+import hashlib
+import inspect
+import threading
+from functools import wraps
+
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", "llm_cache.db")
+
+_conn = None
+_lock = threading.Lock()
+
+def _get_conn():
+    # Streamlit runs each rerun on its own thread, so share one connection behind a lock
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT, created REAL)"
+        )
+        _conn.commit()
+    return _conn
+
+def cache_key(namespace: str, prompt: str) -> str:
+    return hashlib.sha256((namespace + "\0" + prompt).encode("utf-8")).hexdigest()
+
+def get(key: str):
+    with _lock:
+        row = _get_conn().execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def put(key: str, value: str):
+    with _lock:
+        conn = _get_conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, created) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+        conn.commit()
+
+def cached(fn):
+    """
+    Persist the result of `fn(self, prompt) -> str` in SQLite, keyed on
+    sha256(self.cache_namespace + prompt). The namespace names the provider
+    and model/deployment, so switching models does not return stale answers.
+    Works on sync and async methods. Exceptions and empty results are
+    not cached.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @wraps(fn)
+        async def awrapper(self, prompt: str) -> str:
+            key = cache_key(self.cache_namespace, prompt)
+            hit = get(key)
+            if hit is not None:
+                return hit
+            result = await fn(self, prompt)
+            if result:
+                put(key, result)
+            return result
+        return awrapper
+
+    @wraps(fn)
+    def wrapper(self, prompt: str) -> str:
+        key = cache_key(self.cache_namespace, prompt)
+        hit = get(key)
+        if hit is not None:
+            return hit
+        result = fn(self, prompt)
+        if result:
+            put(key, result)
+        return result
+    return wrapper
@@ -0,0 +1,295 @@
+import re
+import asyncio
+import hashlib
+import weakref
+from functools import lru_cache
+from typing import List
+from sqlparse import lexer, tokens as T
+import llm_cache
+from llm_cache import cached
+
+# ──────────────── LLM PROVIDERS (Strategy Pattern) ────────────────
+BATCH_SEPARATOR = "===NEXT==="
+_BATCH_SPLIT_RE = re.compile(r"^\s*" + re.escape(BATCH_SEPARATOR) + r"\s*$", re.MULTILINE)
+
+@lru_cache(maxsize=4096)
+def _compact_sql(block: str) -> str:
+    # Comments and blank lines cost input tokens without helping the conversion.
+    # Line breaks are kept so procedures stay readable to the model. Memoized because
+    # every prompt build, including each batch cache probe, compacts the same blocks.
+    text = "".join(
+        ("\n" if "\n" in value else " ") if ttype in T.Comment else value
+        for ttype, value in lexer.tokenize(block)
+    )
+    return "\n".join(line.rstrip() for line in text.splitlines() if line.strip())
+
+class LLMProvider:
+    def convert(self, block: str) -> str:
+        raise NotImplementedError
+    async def aconvert(self, block: str) -> str:
+        return await asyncio.to_thread(self.convert, block)
+    def _generate(self, prompt: str) -> str:
+        raise NotImplementedError
+    async def _agenerate(self, prompt: str) -> str:
+        return await asyncio.to_thread(self._generate, prompt)
+    @cached
+    def _complete(self, prompt: str) -> str:
+        return self._generate(prompt)
+    @cached
+    async def _acomplete(self, prompt: str) -> str:
+        return await self._agenerate(prompt)
+    def _prompt(self, block: str) -> str:
+        raise NotImplementedError
+    def _batch_prompt(self, blocks: List[str]) -> str:
+        raise NotImplementedError
+    def _join_batch(self, blocks: List[str]) -> str:
+        return f"\n{BATCH_SEPARATOR}\n".join(self._compact(b) for b in blocks)
+    def _batch_lookup(self, blocks: List[str]):
+        # Batch results are cached per block under the single-block prompt key, so
+        # they are shared with convert() and a bad batch reply is never stored
+        keys = [llm_cache.cache_key(self.cache_namespace, self._prompt(b)) for b in blocks]
+        results = [llm_cache.get(k) for k in keys]
+        return keys, results, [i for i, r in enumerate(results) if r is None]
+    def _batch_store(self, keys: List[str], results: List[str], missing: List[int], reply) -> List[str]:
+        if isinstance(reply, Exception):
+            error = f"# Batch Error: {reply}"
+            parts = None
+        else:
+            parts = [p.strip() for p in _BATCH_SPLIT_RE.split(reply)]
+            # Can't trust the alignment; mark every block so nothing is silently misattributed
+            error = f"# Batch Error: expected {len(missing)} blocks, got {len(parts)}"
+            if len(parts) != len(missing):
+                parts = None
+        for n, i in enumerate(missing):
+            results[i] = parts[n] if parts else error
+            if parts and parts[n]:
+                llm_cache.put(keys[i], parts[n])
+        return results
+    def convert_batch(self, blocks: List[str]) -> List[str]:
+        # Several small blocks in one request; a single block uses the normal prompt
+        keys, results, missing = self._batch_lookup(blocks)
+        if len(missing) == 1:
+            results[missing[0]] = self.convert(blocks[missing[0]])
+        elif missing:
+            try:
+                reply = self._generate(self._batch_prompt([blocks[i] for i in missing]))
+            except Exception as e:
+                reply = e
+            self._batch_store(keys, results, missing, reply)
+        return results
+    async def aconvert_batch(self, blocks: List[str]) -> List[str]:
+        keys, results, missing = self._batch_lookup(blocks)
+        if len(missing) == 1:
+            results[missing[0]] = await self.aconvert(blocks[missing[0]])
+        elif missing:
+            try:
+                reply = await self._agenerate(self._batch_prompt([blocks[i] for i in missing]))
+            except Exception as e:
+                reply = e
+            self._batch_store(keys, results, missing, reply)
+        return results
+    def convert_stream(self, block: str, placeholder) -> str:
+        result = self.convert(block)
+        placeholder.code(result, language="python")
+        return result
+    def _stream_cached(self, prompt: str, chunks, placeholder) -> str:
+        # Render text as it arrives; only a fully received, non-empty completion is cached
+        key = llm_cache.cache_key(self.cache_namespace, prompt)
+        hit = llm_cache.get(key)
+        if hit is not None:
+            placeholder.code(hit, language="python")
+            return hit
+        parts = []
+        for text in chunks(prompt):
+            parts.append(text)
+            placeholder.code("".join(parts), language="python")
+        result = "".join(parts).strip()
+        # An empty reply (e.g. every chunk dropped by a content filter) must not stick
+        if result:
+            llm_cache.put(key, result)
+        return result
+    @staticmethod
+    def _compact(block: str) -> str:
+        return _compact_sql(block)
+
+class GeminiProvider(LLMProvider):
+    def __init__(self, api_key: str, model_name: str = "gemini-1.5-pro"):
+        # Talk to the service clients directly: genai.configure() and the SDK's default
+        # clients are process-wide, and providers for different keys live side by side
+        from google.ai import generativelanguage as glm
+        from google.api_core.client_options import ClientOptions
+        self.glm = glm
+        self.client_options = ClientOptions(api_key=api_key)
+        self.model_name = model_name
+        self.cache_namespace = f"gemini:{model_name}"
+        self.client = glm.GenerativeServiceClient(client_options=self.client_options)
+        self._async_clients = weakref.WeakKeyDictionary()
+    def _async_client(self):
+        # The async client is bound to the loop it was created on, and every
+        # Convert All click runs a new loop, so keep one client per running loop
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            client = self._async_clients[loop] = self.glm.GenerativeServiceAsyncClient(
+                client_options=self.client_options
+            )
+        return client
+    def _request(self, prompt: str):
+        return self.glm.GenerateContentRequest(
+            model=f"models/{self.model_name}",
+            contents=[self.glm.Content(role="user", parts=[self.glm.Part(text=prompt)])],
+        )
+    @staticmethod
+    def _text(resp, partial: bool = False) -> str:
+        if not resp.candidates:
+            if partial:
+                return ""
+            raise ValueError(f"No candidates returned (block reason: {resp.prompt_feedback.block_reason.name})")
+        return "".join(part.text for part in resp.candidates[0].content.parts)
+    _RULES = (
+        "- Keep business logic and variable/column names.\n"
+        "- Idiomatic PySpark; no .rdd or UDFs unless unavoidable.\n"
+        "- IF/WHILE/LOOP/EXCEPTION as native Python; SELECT/JOIN/WHERE/GROUP BY as DataFrame ops.\n"
+        "- Output only executable Python: no comments, explanations, or markdown.\n"
+    )
+    def _prompt(self, block: str) -> str:
+        return (
+            "Senior data engineer: convert this PL/SQL block to production-ready PySpark DataFrame API code.\n"
+            f"{self._RULES}\n"
+            f"PL/SQL Block:\n{self._compact(block)}\n"
+        )
+    def _batch_prompt(self, blocks: List[str]) -> str:
+        return (
+            "Senior data engineer: convert each PL/SQL block below to production-ready PySpark DataFrame API code.\n"
+            f"{self._RULES}"
+            f"- Separate the converted blocks with the exact line '{BATCH_SEPARATOR}' and keep their order.\n\n"
+            f"PL/SQL Blocks:\n{self._join_batch(blocks)}\n"
+        )
+    def convert(self, block: str) -> str:
+        try:
+            return self._complete(self._prompt(block))
+        except Exception as e:
+            return f"# Gemini Error: {e}"
+    async def aconvert(self, block: str) -> str:
+        try:
+            return await self._acomplete(self._prompt(block))
+        except Exception as e:
+            return f"# Gemini Error: {e}"
+    def convert_stream(self, block: str, placeholder) -> str:
+        try:
+            return self._stream_cached(self._prompt(block), self._chunks, placeholder)
+        except Exception as e:
+            return f"# Gemini Error: {e}"
+    def _chunks(self, prompt: str):
+        for chunk in self.client.stream_generate_content(self._request(prompt)):
+            yield self._text(chunk, partial=True)
+    def _generate(self, prompt: str) -> str:
+        resp = self.client.generate_content(self._request(prompt))
+        return self._text(resp).strip()
+    async def _agenerate(self, prompt: str) -> str:
+        resp = await self._async_client().generate_content(self._request(prompt))
+        return self._text(resp).strip()
+
+class OpenAIProvider(LLMProvider):
+    def __init__(self, api_key, api_base, api_type, api_version, deployment_name):
+        import openai
+        self.openai = openai
+        # Passed on every call rather than set on the openai module: the provider is
+        # shared across reruns, and another credential set may have been used since
+        self.credentials = dict(api_key=api_key, api_base=api_base, api_type=api_type, api_version=api_version)
+        self.deployment_name = deployment_name
+        self.cache_namespace = f"azure-openai:{deployment_name}"
+    def _prompt(self, block: str) -> str:
+        return (
+            "You are a data engineer. Convert the following PL/SQL code block into PySpark DataFrame API code.\n"
+            "Only return valid, executable Python code. Do not include explanations, comments, or markdown.\n"
+            f"PL/SQL Block:\n{self._compact(block)}\n"
+        )
+    def _batch_prompt(self, blocks: List[str]) -> str:
+        return (
+            "You are a data engineer. Convert each PL/SQL block below into PySpark DataFrame API code.\n"
+            "Only return valid, executable Python code. Do not include explanations, comments, or markdown.\n"
+            f"Return the converted blocks separated by the exact line '{BATCH_SEPARATOR}'. Keep the order.\n"
+            f"PL/SQL Blocks:\n{self._join_batch(blocks)}\n"
+        )
+    def convert(self, block: str) -> str:
+        try:
+            return self._complete(self._prompt(block))
+        except Exception as e:
+            return f"# OpenAI Error: {e}"
+    async def aconvert(self, block: str) -> str:
+        try:
+            return await self._acomplete(self._prompt(block))
+        except Exception as e:
+            return f"# OpenAI Error: {e}"
+    def convert_stream(self, block: str, placeholder) -> str:
+        try:
+            return self._stream_cached(self._prompt(block), self._chunks, placeholder)
+        except Exception as e:
+            return f"# OpenAI Error: {e}"
+    def _chunks(self, prompt: str):
+        for chunk in self.openai.ChatCompletion.create(
+            engine=self.deployment_name,
+            messages=[{"role": "user", "content": prompt}],
+            **self.credentials,
+            temperature=0.3,
+            stream=True
+        ):
+            if chunk.choices:
+                yield chunk.choices[0].delta.get("content") or ""
+    def _generate(self, prompt: str) -> str:
+        resp = self.openai.ChatCompletion.create(
+            engine=self.deployment_name,
+            messages=[{"role": "user", "content": prompt}],
+            **self.credentials,
+            temperature=0.3
+        )
+        return resp.choices[0].message.content.strip()
+    async def _agenerate(self, prompt: str) -> str:
+        resp = await self.openai.ChatCompletion.acreate(
+            engine=self.deployment_name,
+            messages=[{"role": "user", "content": prompt}],
+            **self.credentials,
+            temperature=0.3
+        )
+        return resp.choices[0].message.content.strip()
+
+# ──────────────── BATCHING ────────────────
+def batch_blocks(blocks: List[str], max_chars: int = 3000) -> List[List[int]]:
+    # Group consecutive blocks into batches whose combined length stays under max_chars
+    batches = []
+    current = []
+    size = 0
+    for i, block in enumerate(blocks):
+        if current and size + len(block) >= max_chars:
+            batches.append(current)
+            current = []
+            size = 0
+        current.append(i)
+        size += len(block)
+    if current:
+        batches.append(current)
+    return batches
+
+async def convert_all(provider: LLMProvider, blocks: List[str], on_done=None, concurrency: int = 8) -> List[str]:
+    # One event loop, at most `concurrency` requests in flight
+    sem = asyncio.Semaphore(concurrency)
+    # Identical blocks (repeated boilerplate) are sent once and fanned back out
+    unique = {}
+    positions = {}
+    for i, block in enumerate(blocks):
+        key = hashlib.sha1(block.encode("utf-8")).hexdigest()
+        unique.setdefault(key, block)
+        positions.setdefault(key, []).append(i)
+    keys = list(unique)
+    results = [None] * len(blocks)
+    async def run(batch: List[int]):
+        async with sem:
+            converted = await provider.aconvert_batch([unique[keys[j]] for j in batch])
+        for j, result in zip(batch, converted):
+            for i in positions[keys[j]]:
+                results[i] = result
+                if on_done:
+                    on_done(i, result)
+    await asyncio.gather(*(run(batch) for batch in batch_blocks([unique[k] for k in keys])))
+    return results
@@ -1,5 +1,135 @@
+import os
 import re
-import sqlparse
+
+# Set PLSQL_CHUNKER_USE_SQLPARSE=1 to split statements with sqlparse instead
+USE_SQLPARSE = os.getenv("PLSQL_CHUNKER_USE_SQLPARSE") == "1"
+
+# Leading whitespace/comments are skipped so a commented block still counts as a start.
+# Each alternative can only match one way (single '\s', a comment up to its newline, a
+# block comment that can't run past '*/'), otherwise a miss backtracks exponentially.
+_BLOCK_START_RE = re.compile(r'^(?:\s|--[^\n]*\n|/\*(?:[^*]|\*(?!/))*\*/)*(?:CREATE|DECLARE|BEGIN)\b', re.IGNORECASE)
+_BLOCK_END_RE = re.compile(r'\bEND\b\s*[\w$]*\s*;', re.IGNORECASE)
+# '[^\W\d]' is any Unicode letter or '_', matching the str.isalpha() check in the scanner
+_WORD_RE = re.compile(r'[^\W\d][\w$#]*')
+_NEXT_WORD_RE = re.compile(r'\s*([^\W\d][\w$#]*)')
+_NESTED_END_WORDS = frozenset(('IF', 'LOOP', 'WHILE', 'FOR', 'CASE'))
+# Oracle alternative quoting: q'[...]', nq'{...}', q'!...!'
+_QQUOTE_RE = re.compile(r"[nN]?[qQ]'(.)", re.DOTALL)
+_QQUOTE_CLOSERS = {'[': ']', '{': '}', '(': ')', '<': '>'}
+
+def _is_slash_line(code: str, i: int) -> bool:
+    """True if the '/' at code[i] is alone on its line (SQL*Plus terminator)."""
+    line_start = code.rfind('\n', 0, i) + 1
+    line_end = code.find('\n', i)
+    if line_end == -1:
+        line_end = len(code)
+    return not code[line_start:i].strip() and not code[i + 1:line_end].strip()
+
+def _split_statements(code: str) -> list[str]:
+    """
+    Split code on top-level ';' and lone '/' lines, skipping over quoted
+    text (including q'[...]' literals) and comments. BEGIN...END and
+    CASE...END nesting is tracked so the ';' inside a PL/SQL body does not
+    end the statement.
+    """
+    statements = []
+    stack = []
+    parens = 0
+    start = 0
+    i = 0
+    n = len(code)
+    while i < n:
+        c = code[i]
+        if c == "'" or c == '"':
+            end = code.find(c, i + 1)
+            i = n if end == -1 else end + 1
+            continue
+        if c == '-' and code.startswith('--', i):
+            end = code.find('\n', i)
+            i = n if end == -1 else end + 1
+            continue
+        if c == '/':
+            if code.startswith('/*', i):
+                end = code.find('*/', i + 2)
+                i = n if end == -1 else end + 2
+                continue
+            if _is_slash_line(code, i):
+                if code[start:i].strip():
+                    statements.append(code[start:i])
+                stack.clear()
+                parens = 0
+                start = i + 1
+            i += 1
+            continue
+        if c == '(':
+            parens += 1
+        elif c == ')':
+            parens = max(0, parens - 1)
+        elif c == ';':
+            if not stack and parens == 0:
+                statements.append(code[start:i + 1])
+                start = i + 1
+        elif c.isalpha() or c == '_':
+            if i and (code[i - 1].isalnum() or code[i - 1] in '_$#'):
+                i += 1
+                continue
+            if c in 'nNqQ':
+                quoted = _QQUOTE_RE.match(code, i)
+                if quoted:
+                    delim = quoted.group(1)
+                    end = code.find(_QQUOTE_CLOSERS.get(delim, delim) + "'", quoted.end())
+                    i = n if end == -1 else end + 2
+                    continue
+            word = _WORD_RE.match(code, i)
+            i = word.end()
+            unified = word.group().upper()
+            if unified == 'BEGIN' or unified == 'CASE':
+                stack.append(unified)
+            elif unified == 'END':
+                nxt = _NEXT_WORD_RE.match(code, i)
+                closes = nxt.group(1).upper() if nxt else ''
+                if closes in _NESTED_END_WORDS:
+                    # END IF / END LOOP / END CASE: consume the keyword so it isn't reopened
+                    i = nxt.end()
+                    if closes == 'CASE' and stack and stack[-1] == 'CASE':
+                        stack.pop()
+                elif stack:
+                    stack.pop()
+            continue
+        i += 1
+    if code[start:].strip():
+        statements.append(code[start:])
+    return statements
+
+def _split_points(lens, max_size: int):
+    """Indices after which the running length reaches max_size (then resets)."""
+    points = []
+    running = 0
+    for i in range(len(lens)):
+        running += lens[i]
+        if running >= max_size:
+            points.append(i + 1)
+            running = 0
+    return points
+
+# Numba is optional: when installed the scan is compiled, otherwise it runs as plain Python
+try:
+    import numpy as np
+    from numba import njit
+    _split_points_jit = njit(cache=True)(_split_points)
+except ImportError:
+    _split_points_jit = None
+
+def _chunk_points(lens, max_size: int):
+    global _split_points_jit
+    if _split_points_jit is not None:
+        try:
+            return _split_points_jit(np.array(lens, dtype=np.int64), max_size)
+        except Exception:
+            # Compile errors or a stale/unreadable cache=True file: stop using the
+            # jitted version for this process and take the pure-Python path
+            _split_points_jit = None
+    return _split_points(lens, max_size)
 
 def split_plsql_into_blocks(plsql: str, max_chunk_size=1200):
     """
@@ -10,28 +140,31 @@ def split_plsql_into_blocks(plsql: str, max_chunk_size=1200):
     """
     # Normalize line endings
     code = plsql.replace('\r\n', '\n').replace('\r', '\n')
-    statements = sqlparse.split(code)
     blocks = []
-    buffer = ""
+    buf_parts = []
     in_block = False
-    block_start_pattern = re.compile(r'^\s*(CREATE|DECLARE|BEGIN)', re.IGNORECASE)
-    block_end_pattern = re.compile(r'END\s*;|END\s*[\w$]*\s*;', re.IGNORECASE)
+    if USE_SQLPARSE:
+        import sqlparse
+        statements = sqlparse.split(code)
+    else:
+        statements = _split_statements(code)
     for stmt in statements:
-        stripped = stmt.strip()
+        stmt = stmt.strip()
         # Start of a block
-        if block_start_pattern.match(stripped):
-            if buffer:
-                blocks.append(buffer.strip())
-                buffer = ""
+        if _BLOCK_START_RE.match(stmt):
+            if buf_parts:
+                blocks.append("\n".join(buf_parts).strip())
+                buf_parts.clear()
             in_block = True
-        buffer += (stmt if buffer == "" else "\n" + stmt)
+        if stmt:
+            buf_parts.append(stmt)
         # End of a block
-        if in_block and block_end_pattern.search(stripped):
-            blocks.append(buffer.strip())
-            buffer = ""
+        if in_block and _BLOCK_END_RE.search(stmt):
+            blocks.append("\n".join(buf_parts).strip())
+            buf_parts.clear()
             in_block = False
-    if buffer.strip():
-        blocks.append(buffer.strip())
+    if buf_parts:
+        blocks.append("\n".join(buf_parts).strip())
 
     # Fallback: if still too big, chunk by chars
     final_blocks = []
@@ -39,14 +172,15 @@ def split_plsql_into_blocks(plsql: str, max_chunk_size=1200):
         if len(blk) > max_chunk_size:
             # Split by ';' but keep context
             stmts = blk.split(';')
-            temp = ""
-            for s in stmts:
-                temp += s + ';'
-                if len(temp) >= max_chunk_size:
-                    final_blocks.append(temp.strip())
-                    temp = ""
-            if temp.strip():
-                final_blocks.append(temp.strip())
+            points = _chunk_points([len(s) + 1 for s in stmts], max_chunk_size)
+            start = 0
+            for end in points:
+                final_blocks.append((';'.join(stmts[start:end]) + ';').strip())
+                start = end
+            if start < len(stmts):
+                tail = (';'.join(stmts[start:]) + ';').strip()
+                if tail:
+                    final_blocks.append(tail)
         else:
             final_blocks.append(blk)
     return final_blocks
\ No newline at end of file
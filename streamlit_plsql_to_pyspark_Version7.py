@@ -1,17 +1,28 @@
 import os
 import io
+import csv
+import base64
+import hashlib
 import tempfile
-import subprocess
+import asyncio
 import streamlit as st
-import pandas as pd
 from dotenv import load_dotenv
 from typing import List, Optional
-import sqlparse
 from plsql_chunker import split_plsql_into_blocks
+from llm_providers import LLMProvider, GeminiProvider, OpenAIProvider, convert_all
 
 # ──────────────── ENV & API LOADERS ────────────────
+CRED_KEYS = (
+    "gemini_api_key", "openai_api_key", "openai_api_base", "openai_api_type",
+    "openai_api_version", "deployment_name", "model_name",
+)
+
 def load_env_from_session(session_state):
     # Use session_state or .env for API credentials
+    # Reuse the last result while the credential inputs are unchanged
+    key = tuple(session_state.get(k) for k in CRED_KEYS)
+    if session_state.get("_env_key") == key and "_env_cache" in session_state:
+        return session_state["_env_cache"]
     env = {}
     # Gemini
     env["GEMINI_API_KEY"] = session_state.get("gemini_api_key") or os.getenv("GEMINI_API_KEY")
@@ -22,87 +33,71 @@ def load_env_from_session(session_state):
     env["OPENAI_API_VERSION"] = session_state.get("openai_api_version") or os.getenv("OPENAI_API_VERSION")
     env["DEPLOYMENT_NAME"] = session_state.get("deployment_name") or os.getenv("DEPLOYMENT_NAME")
     env["MODEL_NAME"] = session_state.get("model_name") or os.getenv("MODEL_NAME", "gpt-4o")
+    session_state["_env_key"] = key
+    session_state["_env_cache"] = env
     return env
 
-# ──────────────── LLM PROVIDERS (Strategy Pattern) ────────────────
-class LLMProvider:
-    def convert(self, block: str) -> str:
-        raise NotImplementedError
-
-class GeminiProvider(LLMProvider):
-    def __init__(self, api_key: str):
-        from google.generativeai import configure as gemini_configure, GenerativeModel
-        gemini_configure(api_key=api_key)
-        self.model = GenerativeModel("gemini-1.5-pro")
-    def convert(self, block: str) -> str:
-        prompt = (
-            "You are a senior data engineer experienced in migrating legacy PL/SQL code to PySpark.\n\n"
-            "Convert the following PL/SQL block into clean, production-ready PySpark using the DataFrame API.\n"
-            "Your output MUST:\n"
-            "- Retain business logic and variable/column naming.\n"
-            "- Use idiomatic PySpark (no unnecessary .rdd or UDF unless unavoidable).\n"
-            "- Implement control structures (IF, WHILE, LOOP, EXCEPTION) using native Python logic where applicable.\n"
-            "- Translate SQL operations (SELECT, JOIN, WHERE, GROUP BY) to PySpark.\n"
-            "- Avoid comments, explanations, or markdown. Return only executable Python code.\n\n"
-            f"PL/SQL Block:\n{block}\n"
-        )
-        try:
-            resp = self.model.generate_content(prompt)
-            return resp.text.strip()
-        except Exception as e:
-            return f"# Gemini Error: {e}"
-
-class OpenAIProvider(LLMProvider):
-    def __init__(self, api_key, api_base, api_type, api_version, deployment_name):
-        import openai
-        self.openai = openai
-        openai.api_key = api_key
-        openai.api_base = api_base
-        openai.api_type = api_type
-        openai.api_version = api_version
-        self.deployment_name = deployment_name
-    def convert(self, block: str) -> str:
-        prompt = (
-            "You are a data engineer. Convert the following PL/SQL code block into PySpark DataFrame API code.\n"
-            "Only return valid, executable Python code. Do not include explanations, comments, or markdown.\n"
-            f"PL/SQL Block:\n{block}\n"
-        )
-        try:
-            resp = self.openai.ChatCompletion.create(
-                engine=self.deployment_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.3
-            )
-            return resp.choices[0].message.content.strip()
-        except Exception as e:
-            return f"# OpenAI Error: {e}"
+# ──────────────── PARSING ────────────────
+@st.cache_data(show_spinner=False)
+def _split_cached(digest: str, max_chunk_size: int, _code: str) -> List[str]:
+    # Streamlit reruns the script on every interaction; skip re-parsing unchanged input.
+    # Keyed on the input digest: the leading underscore keeps _code out of Streamlit's hashing.
+    return split_plsql_into_blocks(_code, max_chunk_size=max_chunk_size)
 
+# ──────────────── LLM PROVIDERS ────────────────
 def get_llm_provider(choice: str, env) -> Optional[LLMProvider]:
     if choice == "Gemini" and env["GEMINI_API_KEY"]:
-        return GeminiProvider(env["GEMINI_API_KEY"])
+        return _build_provider(choice, (env["GEMINI_API_KEY"],))
     elif choice == "Azure OpenAI" and env["OPENAI_API_KEY"]:
-        return OpenAIProvider(
+        return _build_provider(choice, (
             env["OPENAI_API_KEY"], env["OPENAI_API_BASE"], env["OPENAI_API_TYPE"],
             env["OPENAI_API_VERSION"], env["DEPLOYMENT_NAME"]
-        )
+        ))
     return None
 
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _build_provider(choice: str, credentials: tuple) -> LLMProvider:
+    # Providers import their SDK on construction; build each one once, not on every rerun
+    if choice == "Gemini":
+        return GeminiProvider(*credentials)
+    return OpenAIProvider(*credentials)
+
 # ──────────────── LINTING ────────────────
+@st.cache_data(show_spinner=False)
 def lint_code(code: str) -> str:
+    # Run flake8 in-process instead of paying for a subprocess interpreter startup
+    from flake8.api import legacy as flake8_api
+    from flake8.formatting.default import Default
+    lines = []
+    class _Collector(Default):
+        def _write(self, output: str) -> None:
+            lines.append(output)
     try:
         with tempfile.NamedTemporaryFile("w", delete=False, suffix=".py") as f:
             f.write(code)
             temp_path = f.name
-        result = subprocess.run(["flake8", temp_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        os.unlink(temp_path)
-        return result.stdout.decode("utf-8") or "✅ No lint issues found."
+        try:
+            style = flake8_api.get_style_guide()
+            style.init_report(_Collector)
+            style.check_files([temp_path])
+        finally:
+            os.unlink(temp_path)
+        return "\n".join(lines) or "✅ No lint issues found."
     except Exception as e:
         return f"⚠️ Linting failed: {e}"
 
 # ──────────────── FAKE USER PROFILE ────────────────
-def show_fake_user_profile():
-    st.markdown(
-        """
+# Inline avatar so the sidebar does not wait on an external image request
+_AVATAR_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="128" height="128">'
+    '<rect width="128" height="128" fill="#2c5364"/>'
+    '<text x="50%" y="50%" dy=".35em" text-anchor="middle" fill="#ffd700" '
+    'font-family="Helvetica,Arial,sans-serif" font-size="52">RC</text>'
+    '</svg>'
+)
+_AVATAR_B64 = base64.b64encode(_AVATAR_SVG.encode("utf-8")).decode("ascii")
+
+_PROFILE_HTML = """
         <style>
         .profile-card {
             background: linear-gradient(135deg, #0f2027 0%, #2c5364 100%);
@@ -140,22 +135,19 @@ def show_fake_user_profile():
         }
         </style>
         <div class="profile-card">
-            <img src="https://ui-avatars.com/api/?name=Rahul+Chavan&background=2c5364&color=ffd700&size=128" class="profile-avatar" />
+            <img src="data:image/svg+xml;base64,""" + _AVATAR_B64 + """" class="profile-avatar" />
             <div class="profile-info">
                 <span class="profile-name">Rahul Chavan</span>
                 <span class="profile-role">🪄 Data Engineer</span>
             </div>
         </div>
-        """,
-        unsafe_allow_html=True
-    )
-
-# ──────────────── STREAMLIT UI ────────────────
+"""
 
-st.set_page_config(page_title="PL/SQL to PySpark • Rich UI", layout="wide")
+def show_fake_user_profile():
+    st.markdown(_PROFILE_HTML, unsafe_allow_html=True)
 
-# Custom global background and luxury effect
-st.markdown("""
+# ──────────────── GLOBAL STYLES ────────────────
+_CSS_BLOB = """
     <style>
     body {
         background: linear-gradient(120deg,#162447 0%,#1f4068 100%);
@@ -203,7 +195,15 @@ st.markdown("""
         box-shadow: 0 2px 12px #FFD70044;
     }
     </style>
-""", unsafe_allow_html=True)
+"""
+
+# ──────────────── STREAMLIT UI ────────────────
+
+st.set_page_config(page_title="PL/SQL to PySpark • Rich UI", layout="wide")
+
+# Custom global background and luxury effect (emitted every rerun: Streamlit
+# removes elements a rerun doesn't re-emit, so gating it would drop the styles)
+st.markdown(_CSS_BLOB, unsafe_allow_html=True)
 
 st.title("🔄 <span style='color:#FFD700;'>PL/SQL</span> to <span style='color:#FFD700;'>PySpark</span> Converter <span style='font-size:0.7em;color:#FFD700;'>✨ Luxury UI</span>", unsafe_allow_html=True)
 
@@ -280,33 +280,44 @@ if sql_code:
     st.code(sql_code, language="sql")
 
     # --- Advanced robust parsing here ---
-    blocks = split_plsql_into_blocks(sql_code, max_chunk_size=1200)
+    sql_digest = hashlib.blake2b(sql_code.encode("utf-8"), digest_size=8).digest()
+    blocks = _split_cached(sql_digest.hex(), 1200, sql_code)
     provider = get_llm_provider(llm_choice, env)
     if provider is None:
         st.error("❌ LLM provider not properly configured. Check your API credentials.")
         st.stop()
 
     # Session state for conversions
-    if "converted_blocks" not in st.session_state or st.session_state.get("sql_snapshot") != sql_code:
+    if "converted_blocks" not in st.session_state or st.session_state.get("sql_digest") != sql_digest:
         st.session_state["converted_blocks"] = [None] * len(blocks)
-        st.session_state["sql_snapshot"] = sql_code
+        st.session_state["sql_digest"] = sql_digest
 
     # Convert each chunk (with progress bar, allow re-run per chunk)
     converted_blocks = st.session_state["converted_blocks"]
     st.markdown("<div style='font-size:1.15em;font-weight:500;color:#FFD700;margin:22px 0 0 0;'>🔄 Convert Blocks</div>", unsafe_allow_html=True)
+    pending = [i for i, cb in enumerate(converted_blocks) if cb is None]
+    if st.button("⚡ Convert All", key="convert_all", disabled=not pending):
+        progress = st.progress(0.0, text="Converting blocks...")
+        done = []
+        def on_done(j, result):
+            converted_blocks[pending[j]] = result
+            done.append(j)
+            progress.progress(len(done) / len(pending), text=f"Converted {len(done)}/{len(pending)} blocks")
+        asyncio.run(convert_all(provider, [blocks[i] for i in pending], on_done))
+        progress.empty()
     for i, block in enumerate(blocks):
         col1, col2 = st.columns([3, 5])
+        ph = col2.empty()
         with col1:
             st.markdown(f"<div style='color:#FFD700;font-weight:600;'>Block {i+1}</div>", unsafe_allow_html=True)
             st.code(block, language="sql")
             if st.button(f"Convert Block {i+1}", key=f"convert_{i}"):
                 with st.spinner("Converting..."):
-                    converted_blocks[i] = provider.convert(block)
-        with col2:
-            if converted_blocks[i]:
-                st.code(converted_blocks[i], language="python")
-            else:
-                st.info("Not converted yet.")
+                    converted_blocks[i] = provider.convert_stream(block, ph)
+        if converted_blocks[i]:
+            ph.code(converted_blocks[i], language="python")
+        else:
+            ph.info("Not converted yet.")
 
     # Merge output
     all_converted = [cb for cb in converted_blocks if cb]
@@ -323,14 +334,15 @@ if sql_code:
 
         # Preview Table
         st.markdown("<div style='font-size:1.09em;font-weight:500;color:#FFD700;margin:20px 0 0 0;'>🧾 Preview: PL/SQL Block vs PySpark</div>", unsafe_allow_html=True)
-        preview_df = pd.DataFrame({
+        st.dataframe({
             "PL/SQL Block": blocks,
             "Converted PySpark": converted_blocks
-        })
-        st.dataframe(preview_df, use_container_width=True)
+        }, use_container_width=True)
         # Download as CSV
         csv_buffer = io.StringIO()
-        preview_df.to_csv(csv_buffer, index=False)
+        w = csv.writer(csv_buffer)
+        w.writerow(["PL/SQL Block", "Converted PySpark"])
+        w.writerows(zip(blocks, converted_blocks))
         st.download_button("📥 Download PL/SQL Blocks (.csv)", data=csv_buffer.getvalue(),
                           file_name="plsql_blocks.csv", mime="text/csv")
     else:
@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+
+import llm_cache
+from llm_providers import BATCH_SEPARATOR, LLMProvider, _compact_sql, batch_blocks, convert_all
+
+pytest.importorskip("sqlparse")
+
+
+class FakeProvider(LLMProvider):
+    cache_namespace = "fake:test"
+
+    def __init__(self, reply=None):
+        self.reply = reply
+        self.prompts = []
+
+    def _prompt(self, block):
+        return f"convert:\n{self._compact(block)}"
+
+    def _batch_prompt(self, blocks):
+        return f"convert each:\n{self._join_batch(blocks)}"
+
+    def _generate(self, prompt):
+        self.prompts.append(prompt)
+        reply = self.reply(prompt) if callable(self.reply) else self.reply
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    def convert(self, block):
+        return self._complete(self._prompt(block))
+
+
+@pytest.fixture(autouse=True)
+def temp_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_PATH", str(tmp_path / "cache.db"))
+    monkeypatch.setattr(llm_cache, "_conn", None)
+    yield
+    if llm_cache._conn is not None:
+        llm_cache._conn.close()
+
+
+def _cached(provider, block):
+    return llm_cache.get(llm_cache.cache_key(provider.cache_namespace, provider._prompt(block)))
+
+
+def test_cache_round_trip():
+    key = llm_cache.cache_key("ns", "prompt")
+    assert llm_cache.get(key) is None
+    llm_cache.put(key, "value")
+    assert llm_cache.get(key) == "value"
+    assert llm_cache.cache_key("other", "prompt") != key
+
+
+def test_compact_strips_comments_and_keeps_lines():
+    block = (
+        "CREATE OR REPLACE PROCEDURE p IS\n"
+        "  -- counter\n"
+        "  v NUMBER; /* x */\n"
+        "BEGIN\n"
+        "\n"
+        "  v := '-- kept; /* too */';   \n"
+        "END;"
+    )
+    assert _compact_sql(block) == (
+        "CREATE OR REPLACE PROCEDURE p IS\n"
+        "  v NUMBER;\n"
+        "BEGIN\n"
+        "  v := '-- kept; /* too */';\n"
+        "END;"
+    )
+
+
+def test_compact_is_computed_once_per_block():
+    _compact_sql.cache_clear()
+    provider = FakeProvider(reply=f"one\n{BATCH_SEPARATOR}\ntwo")
+    blocks = ["SELECT 1 FROM dual; -- a", "SELECT 2 FROM dual; -- b"]
+    provider.convert_batch(blocks)
+    provider.convert_batch(blocks)
+    assert _compact_sql.cache_info().misses == 2
+
+
+def test_empty_completion_is_not_cached():
+    provider = FakeProvider(reply="")
+    assert provider.convert("SELECT 1 FROM dual;") == ""
+    assert _cached(provider, "SELECT 1 FROM dual;") is None
+
+
+def test_batch_reply_is_cached_per_block():
+    blocks = ["SELECT 1 FROM dual;", "SELECT 2 FROM dual;"]
+    provider = FakeProvider(reply=f"one\n{BATCH_SEPARATOR}\ntwo")
+    assert provider.convert_batch(blocks) == ["one", "two"]
+    assert [_cached(provider, b) for b in blocks] == ["one", "two"]
+    # A second run is served from the cache
+    assert provider.convert_batch(blocks) == ["one", "two"]
+    assert len(provider.prompts) == 1
+
+
+def test_mismatched_batch_reply_is_not_cached():
+    blocks = ["SELECT 1 FROM dual;", "SELECT 2 FROM dual;", "SELECT 3 FROM dual;"]
+    provider = FakeProvider(reply=f"one\n{BATCH_SEPARATOR}\ntwo")
+    results = provider.convert_batch(blocks)
+    assert results == ["# Batch Error: expected 3 blocks, got 2"] * 3
+    assert [_cached(provider, b) for b in blocks] == [None] * 3
+    # The next attempt asks again instead of returning the bad split
+    provider.reply = f"a\n{BATCH_SEPARATOR}\nb\n{BATCH_SEPARATOR}\nc"
+    assert provider.convert_batch(blocks) == ["a", "b", "c"]
+
+
+def test_batch_exception_marks_every_block():
+    blocks = ["SELECT 1 FROM dual;", "SELECT 2 FROM dual;"]
+    provider = FakeProvider(reply=RuntimeError("quota exceeded"))
+    assert provider.convert_batch(blocks) == ["# Batch Error: quota exceeded"] * 2
+    assert [_cached(provider, b) for b in blocks] == [None, None]
+
+
+def test_batch_only_sends_uncached_blocks():
+    blocks = ["SELECT 1 FROM dual;", "SELECT 2 FROM dual;", "SELECT 3 FROM dual;"]
+    provider = FakeProvider(reply=f"one\n{BATCH_SEPARATOR}\nthree")
+    llm_cache.put(llm_cache.cache_key(provider.cache_namespace, provider._prompt(blocks[1])), "two")
+    assert provider.convert_batch(blocks) == ["one", "two", "three"]
+    assert "SELECT 2" not in provider.prompts[0]
+
+
+def test_batch_blocks_limits():
+    assert batch_blocks([]) == []
+    assert batch_blocks(["a" * 10] * 3, max_chars=100) == [[0, 1, 2]]
+    assert batch_blocks(["a" * 40] * 3, max_chars=100) == [[0, 1], [2]]
+    # A block over the limit still gets a batch of its own
+    assert batch_blocks(["a", "a" * 500, "a"], max_chars=100) == [[0], [1], [2]]
+
+
+def test_convert_all_fans_duplicates_out_to_every_position():
+    blocks = ["SELECT 1 FROM dual;", "SELECT 2 FROM dual;", "SELECT 1 FROM dual;", "SELECT 1 FROM dual;"]
+    provider = FakeProvider(reply=f"one\n{BATCH_SEPARATOR}\ntwo")
+    done = {}
+    results = asyncio.run(convert_all(provider, blocks, on_done=done.__setitem__))
+    assert results == ["one", "two", "one", "one"]
+    assert done == dict(enumerate(results))
+    assert len(provider.prompts) == 1
+    assert provider.prompts[0].count("SELECT 1") == 1
+
+
+def test_gemini_providers_keep_their_own_keys_and_loop_clients():
+    glm = pytest.importorskip("google.ai.generativelanguage")
+    from llm_providers import GeminiProvider
+
+    first, second = GeminiProvider("key-one"), GeminiProvider("key-two", "gemini-1.5-flash")
+    assert first.client is not second.client
+    assert (first.client_options.api_key, second.client_options.api_key) == ("key-one", "key-two")
+    assert first.cache_namespace != second.cache_namespace
+
+    async def client():
+        return first._async_client(), first._async_client()
+    a, b = asyncio.run(client())
+    c, _ = asyncio.run(client())
+    assert a is b and a is not c
+    assert isinstance(a, glm.GenerativeServiceAsyncClient)
+
+
+def test_gemini_reply_text_and_blocked_prompt():
+    glm = pytest.importorskip("google.ai.generativelanguage")
+    from llm_providers import GeminiProvider
+
+    provider = GeminiProvider("key")
+    resp = glm.GenerateContentResponse(
+        candidates=[glm.Candidate(content=glm.Content(parts=[glm.Part(text="df = "), glm.Part(text="spark.table('t')\n")]))]
+    )
+    provider.client = type("Client", (), {"generate_content": lambda self, request: resp})()
+    assert provider._generate("prompt") == "df = spark.table('t')"
+    assert provider._request("prompt").model == "models/gemini-1.5-pro"
+
+    blocked = glm.GenerateContentResponse(prompt_feedback={"block_reason": "SAFETY"})
+    provider.client = type("Client", (), {"generate_content": lambda self, request: blocked})()
+    assert provider.convert("SELECT 1 FROM dual;").startswith("# Gemini Error: No candidates returned (block reason: SAFETY)")
+    assert _cached(provider, "SELECT 1 FROM dual;") is None
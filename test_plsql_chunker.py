@@ -0,0 +1,148 @@
+import time
+
+import pytest
+
+import plsql_chunker_Version4 as chunker
+from plsql_chunker_Version4 import _split_points, _split_statements, split_plsql_into_blocks
+
+sqlparse = pytest.importorskip("sqlparse")
+
+
+def _normalize(statements):
+    # sqlparse keeps a SQL*Plus '/' line at the front of the next statement;
+    # the scanner drops it. Compare the remaining text only.
+    out = []
+    for stmt in statements:
+        lines = stmt.strip().split("\n")
+        while lines and lines[0].strip() == "/":
+            lines.pop(0)
+        text = "\n".join(lines).strip()
+        if text:
+            out.append(text)
+    return out
+
+
+CASES = {
+    "unicode_identifiers": "SELECT ñ FROM t;\nUPDATE t SET b = 1 WHERE b = ÜBER;\nBEGIN straße := 1; END;",
+    "quoted_semicolons": "SELECT 'a;b' FROM dual; SELECT \"x;y\" FROM t;",
+    "doubled_quotes": "INSERT INTO t VALUES ('it''s; fine');\nSELECT 1 FROM dual;",
+    "q_quote_brackets": "BEGIN x := q'[it's; here]'; END;\n/\nSELECT 5 FROM dual;",
+    "comments": (
+        "-- leading; comment\n"
+        "SELECT 1 FROM dual; /* block ; comment */\n"
+        "BEGIN\n"
+        "  -- END;\n"
+        "  /* END; */\n"
+        "  NULL;\n"
+        "END;\n"
+        "SELECT 2 FROM dual;"
+    ),
+    "nested_ends": (
+        "BEGIN\n"
+        "  IF a > 0 THEN\n"
+        "    NULL;\n"
+        "  END IF;\n"
+        "  FOR r IN (SELECT 1 FROM dual) LOOP\n"
+        "    NULL;\n"
+        "  END LOOP;\n"
+        "  CASE z WHEN 1 THEN NULL; ELSE NULL; END CASE;\n"
+        "END;\n"
+        "SELECT 3 FROM dual;"
+    ),
+    "case_expression": (
+        "BEGIN\n"
+        "  x := CASE WHEN a = 1 THEN 'one' ELSE 'other' END;\n"
+        "  y := 10 / 2;\n"
+        "END;\n"
+        "SELECT CASE WHEN 1 = 1 THEN 1 END FROM dual;"
+    ),
+    "package_body": (
+        "CREATE OR REPLACE PACKAGE BODY pkg IS\n"
+        "  PROCEDURE a IS\n"
+        "  BEGIN\n"
+        "    NULL;\n"
+        "  END a;\n"
+        "END pkg;\n"
+        "/\n"
+        "SELECT 1 FROM dual;"
+    ),
+    "slash_lines": (
+        "CREATE OR REPLACE PROCEDURE p IS\n"
+        "BEGIN\n"
+        "  NULL;\n"
+        "END;\n"
+        "/\n"
+        "DECLARE\n"
+        "  v NUMBER;\n"
+        "BEGIN\n"
+        "  v := 4 / 2;\n"
+        "END;\n"
+        "/\n"
+        "UPDATE t SET a = 1;"
+    ),
+}
+
+
+@pytest.mark.parametrize("code", CASES.values(), ids=list(CASES))
+def test_split_statements_matches_sqlparse(code):
+    assert _normalize(_split_statements(code)) == _normalize(sqlparse.split(code))
+
+
+def test_q_quote_delimiter_pairs():
+    # sqlparse has no q-quote support and merges these, so check the expected split directly
+    body = (
+        "BEGIN\n"
+        "  a := q'{x'; y}';\n"
+        "  b := Q'(x'; y)';\n"
+        "  c := q'<x'; y>';\n"
+        "  d := q'!x'; y!';\n"
+        "  e := nq'[x'; y]';\n"
+        "END;"
+    )
+    assert _normalize(_split_statements(body + "\nSELECT 1 FROM dual;")) == [body, "SELECT 1 FROM dual;"]
+
+
+def test_q_quote_does_not_swallow_following_blocks():
+    code = "BEGIN x := q'[it's; here]'; END;\n/\nSELECT 5 FROM dual;"
+    assert split_plsql_into_blocks(code) == [
+        "BEGIN x := q'[it's; here]'; END;",
+        "SELECT 5 FROM dual;",
+    ]
+
+
+def test_unterminated_literal_keeps_remaining_text():
+    assert _split_statements("SELECT 'oops FROM dual; SELECT 1") == ["SELECT 'oops FROM dual; SELECT 1"]
+
+def test_comment_then_long_whitespace_before_statement_is_fast():
+    # A leading comment plus a long whitespace run used to backtrack exponentially
+    code = "-- Section: salary maintenance\n\n\n        \n" + " " * 2000 + "UPDATE employees SET salary = 1;"
+    start = time.perf_counter()
+    assert split_plsql_into_blocks(code, max_chunk_size=100000) == [code.strip()]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_many_leading_comments_before_statement_is_fast():
+    code = "/* a */ -- b -- c\n" * 200 + "UPDATE t SET a = 1;"
+    start = time.perf_counter()
+    assert split_plsql_into_blocks(code, max_chunk_size=100000) == [code.strip()]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_split_points_boundaries():
+    assert _split_points([], 10) == []
+    assert _split_points([3, 3, 3], 10) == []
+    assert _split_points([5, 5, 5, 5], 10) == [2, 4]
+    # A single statement over the limit closes a chunk on its own
+    assert _split_points([50, 1, 1], 10) == [1]
+
+
+def test_broken_jit_falls_back_to_python(monkeypatch):
+    def broken(lens, max_size):
+        raise ModuleNotFoundError("No module named '<dynamic>'")
+    monkeypatch.setattr(chunker, "np", pytest.importorskip("numpy"), raising=False)
+    monkeypatch.setattr(chunker, "_split_points_jit", broken)
+    code = "UPDATE t SET a = 1;" * 200
+    expected = chunker._split_points([len(s) + 1 for s in code.split(";")], 1200)
+    assert chunker._chunk_points([len(s) + 1 for s in code.split(";")], 1200) == expected
+    assert chunker._split_points_jit is None
+    assert len(split_plsql_into_blocks(code)) == 4